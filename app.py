@@ -1,16 +1,30 @@
 """
 Flask REST API for Sentiment Analysis using Hugging Face Models
 """
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import torch
 import re
+import csv
+import io
 import emoji
 from datetime import datetime
 import sqlite3
 import os
 from functools import wraps
+from collections import Counter
 import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+try:
+    # Optional: int8 ONNX Runtime inference (pip install optimum[onnxruntime])
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+except ImportError:
+    ORTModelForSequenceClassification = None
 
 app = Flask(__name__)
 CORS(app)
@@ -20,14 +34,103 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-i
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max request size
 API_KEYS = {'demo-api-key-12345', 'test-key-67890'}  # In production, use environment variables
 
-# Global model cache
+# Micro-batching of concurrent /api/analyze requests
+app.config['BATCHER_MAX_BATCH'] = int(os.environ.get('BATCHER_MAX_BATCH', 32))  # Max texts per forward pass
+# How long to wait for more requests to join a batch (0 only batches requests that are already queued)
+app.config['BATCHER_MAX_WAIT_MS'] = float(os.environ.get('BATCHER_MAX_WAIT_MS', 20))
+app.config['BATCHER_QUEUE_SIZE'] = int(os.environ.get('BATCHER_QUEUE_SIZE', 1024))  # Pending requests before new ones are rejected
+app.config['BATCHER_TIMEOUT'] = float(os.environ.get('BATCHER_TIMEOUT', 30))  # Seconds a request waits for its result
+
+# Serve int8-quantized ONNX models instead of the FP32 PyTorch ones (requires optimum)
+app.config['USE_ONNX'] = os.environ.get('USE_ONNX', 'false').lower() in ('1', 'true', 'yes')
+app.config['ONNX_MODEL_DIR'] = os.environ.get('ONNX_MODEL_DIR', 'onnx_models')
+
+# Device for PyTorch models (-1 for CPU, 0+ for a GPU index)
+app.config['MODEL_DEVICE'] = int(os.environ.get('MODEL_DEVICE', -1))
+
+# Run PyTorch models in bfloat16 on CPU / float16 on GPU instead of float32
+app.config['HALF_PRECISION'] = os.environ.get('HALF_PRECISION', 'false').lower() in ('1', 'true', 'yes')
+
+# Compile PyTorch models with torch.compile (slower startup, faster inference)
+app.config['TORCH_COMPILE'] = os.environ.get('TORCH_COMPILE', 'false').lower() in ('1', 'true', 'yes')
+
+# Model selection based on language
+MODEL_MAP = {
+    'en': 'distilbert-base-uncased-finetuned-sst-2-english',
+    'multilingual': 'nlptown/bert-base-multilingual-uncased-sentiment',
+    'es': 'nlptown/bert-base-multilingual-uncased-sentiment',
+    'fr': 'nlptown/bert-base-multilingual-uncased-sentiment',
+    'de': 'nlptown/bert-base-multilingual-uncased-sentiment'
+}
+
+# Multilingual model output (1-5 stars) mapped to normalized sentiment labels
+_STAR_MAP = {
+    '1 STAR': 'NEGATIVE',
+    '2 STARS': 'NEGATIVE',
+    '3 STARS': 'NEUTRAL',
+    '4 STARS': 'POSITIVE',
+    '5 STARS': 'POSITIVE'
+}
+
+# Global model cache, keyed by model name
 models_cache = {}
+_model_lock = threading.Lock()  # Serializes loading so concurrent first requests load a model once
+
+# Number of texts per forward pass when analyzing several texts at once
+INFERENCE_BATCH_SIZE = 32
+
+# Model input limit in tokens, longer texts are truncated by the tokenizer
+MAX_SEQUENCE_LENGTH = 512
+
+# Padded sequence lengths for compiled models, so each bucket reuses one compiled graph
+SEQUENCE_BUCKETS = (64, 128, 256, MAX_SEQUENCE_LENGTH)
+
+# Preprocessing patterns, compiled once at import
+# URL characters: '!', the '$'-'_' range (digits, uppercase, punctuation, %-escapes) and lowercase letters
+_URL_RE = re.compile(r'https?://[!$-_a-z]+')
+_MENTION_RE = re.compile(r'[@#]')
+_WS_RE = re.compile(r'\s+')
+# Cheap pre-check for emoji blocks (pictographs, symbols, dingbats, ZWJ, keycap, variation selector)
+_EMOJI_RE = re.compile(
+    '['
+    '\U0001F000-\U0001FAFF'
+    '\u2190-\u21FF\u2300-\u23FF\u2460-\u27BF\u2900-\u297F\u2B00-\u2BFF'
+    '\u00A9\u00AE\u203C\u2049\u2122\u2139\u3030\u303D\u3297\u3299'
+    '\u200D\u20E3\uFE0F'
+    ']'
+)
 
 # Database setup
+DB_PATH = 'sentiment_history.db'
+
+_db_local = threading.local()
+
+def connect_db():
+    """Open a database connection with the per-connection performance PRAGMAs applied"""
+    conn = sqlite3.connect(DB_PATH)
+    # NORMAL only syncs at WAL checkpoints: a power loss can drop the last commits
+    # but never corrupts the database
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=268435456')  # 256MB
+    conn.execute('PRAGMA cache_size=-65536')  # 64MB
+    return conn
+
+def get_db():
+    """Long-lived connection for the current thread, opened on first use"""
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None:
+        conn = connect_db()
+        _db_local.conn = conn
+    return conn
+
 def init_db():
     """Initialize SQLite database for historical results"""
-    conn = sqlite3.connect('sentiment_history.db')
+    conn = connect_db()
     c = conn.cursor()
+    # WAL is persistent: readers no longer block the writer and commits append instead of rewriting
+    c.execute('PRAGMA journal_mode=WAL')
+    c.execute('BEGIN')
     c.execute('''CREATE TABLE IF NOT EXISTS sentiment_results
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
                   text TEXT NOT NULL,
@@ -35,6 +138,30 @@ def init_db():
                   score REAL NOT NULL,
                   language TEXT DEFAULT 'en',
                   timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+    # Sentiment filter + newest-first ordering, and the unfiltered listing / 24h window
+    c.execute('CREATE INDEX IF NOT EXISTS idx_sent_ts ON sentiment_results (sentiment, timestamp DESC)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_ts ON sentiment_results (timestamp DESC)')
+    
+    # Row counts per sentiment kept up to date by triggers, so history totals avoid COUNT(*) scans
+    c.execute('''CREATE TABLE IF NOT EXISTS sentiment_counts
+                 (sentiment TEXT PRIMARY KEY,
+                  n INTEGER NOT NULL)''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS sentiment_counts_insert
+                 AFTER INSERT ON sentiment_results
+                 BEGIN
+                     INSERT INTO sentiment_counts (sentiment, n) VALUES (NEW.sentiment, 1)
+                     ON CONFLICT (sentiment) DO UPDATE SET n = n + 1;
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS sentiment_counts_delete
+                 AFTER DELETE ON sentiment_results
+                 BEGIN
+                     UPDATE sentiment_counts SET n = n - 1 WHERE sentiment = OLD.sentiment;
+                 END''')
+    # Backfill databases created before the counters existed
+    c.execute('SELECT COUNT(*) FROM sentiment_counts')
+    if c.fetchone()[0] == 0:
+        c.execute('''INSERT INTO sentiment_counts (sentiment, n)
+                     SELECT sentiment, COUNT(*) FROM sentiment_results GROUP BY sentiment''')
     conn.commit()
     conn.close()
 
@@ -51,123 +178,331 @@ def require_api_key(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def load_model(language='en'):
-    """Load and cache sentiment analysis model"""
-    if language in models_cache:
-        return models_cache[language]
-    
-    # Model selection based on language
-    model_map = {
-        'en': 'distilbert-base-uncased-finetuned-sst-2-english',
-        'multilingual': 'nlptown/bert-base-multilingual-uncased-sentiment',
-        'es': 'nlptown/bert-base-multilingual-uncased-sentiment',
-        'fr': 'nlptown/bert-base-multilingual-uncased-sentiment',
-        'de': 'nlptown/bert-base-multilingual-uncased-sentiment'
-    }
-    
-    model_name = model_map.get(language, model_map['multilingual'])
-    
-    try:
-        sentiment_pipeline = pipeline(
-            "sentiment-analysis",
-            model=model_name,
-            tokenizer=model_name,
-            device=-1  # Use CPU, set to 0 for GPU
+def load_onnx_model(model_name):
+    """Export model to ONNX and quantize it to int8, reusing the export from disk when present"""
+    export_dir = os.path.join(app.config['ONNX_MODEL_DIR'], model_name.replace('/', '--'))
+    quantized_dir = os.path.join(export_dir, 'int8')
+    
+    if not os.path.isdir(quantized_dir):
+        ort_model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+        ort_model.save_pretrained(export_dir)
+        quantizer = ORTQuantizer.from_pretrained(ort_model)
+        quantizer.quantize(
+            save_dir=quantized_dir,
+            quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
         )
-        models_cache[language] = sentiment_pipeline
-        return sentiment_pipeline
-    except Exception as e:
-        print(f"Error loading model: {e}")
+    
+    return ORTModelForSequenceClassification.from_pretrained(quantized_dir, file_name='model_quantized.onnx')
+
+def use_onnx():
+    """Whether the int8 ONNX Runtime backend is enabled and available"""
+    return app.config['USE_ONNX'] and ORTModelForSequenceClassification is not None
+
+def use_torch_compile():
+    """Whether PyTorch models are compiled (and inputs padded to SEQUENCE_BUCKETS)"""
+    return app.config['TORCH_COMPILE'] and not use_onnx()
+
+def torch_device():
+    """Device for PyTorch models from MODEL_DEVICE"""
+    device = app.config['MODEL_DEVICE']
+    return torch.device('cuda', device) if device >= 0 else torch.device('cpu')
+
+def half_precision_dtype():
+    """Reduced precision dtype for the configured device, or None for float32"""
+    if not app.config['HALF_PRECISION']:
         return None
+    return torch.float16 if app.config['MODEL_DEVICE'] >= 0 else torch.bfloat16
+
+def autocast():
+    """Autocast context matching the half precision settings of the PyTorch models"""
+    dtype = half_precision_dtype()
+    enabled = dtype is not None and not use_onnx()
+    return torch.autocast(device_type=torch_device().type, dtype=dtype or torch.bfloat16, enabled=enabled)
+
+def load_model(language='en'):
+    """Load and cache the (tokenizer, model) pair for a language"""
+    # es/fr/de share the multilingual model, so the cache is keyed by model name
+    model_name = MODEL_MAP.get(language, MODEL_MAP['multilingual'])
+    if model_name in models_cache:
+        return models_cache[model_name]
+    
+    with _model_lock:
+        # Another thread may have loaded it while we waited for the lock
+        if model_name in models_cache:
+            return models_cache[model_name]
+        
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            if use_onnx():
+                model = load_onnx_model(model_name)
+            else:
+                if app.config['USE_ONNX']:
+                    print("optimum[onnxruntime] is not installed, falling back to PyTorch model")
+                model = AutoModelForSequenceClassification.from_pretrained(
+                    model_name, dtype=half_precision_dtype()
+                ).to(torch_device()).eval()
+                if use_torch_compile():
+                    # Models share the compiled transformers forward wrapper: room for 2 graphs per bucket per model
+                    torch._dynamo.config.cache_size_limit = max(
+                        torch._dynamo.config.cache_size_limit, 2 * len(SEQUENCE_BUCKETS) * len(set(MODEL_MAP.values()))
+                    )
+                    model = torch.compile(model, mode="reduce-overhead")
+            models_cache[model_name] = (tokenizer, model)
+            return models_cache[model_name]
+        except Exception as e:
+            print(f"Error loading model: {e}")
+            return None
 
 def preprocess_text(text):
     """Preprocess text: handle emojis, remove URLs, clean text"""
     if not text:
         return ""
     
-    # Convert emojis to text descriptions
-    text = emoji.demojize(text, delimiters=(" ", " "))
+    # Fast path: plain ASCII without URLs, mentions or hashtags only needs whitespace cleanup
+    if text.isascii() and '@' not in text and '#' not in text and 'http' not in text:
+        return _WS_RE.sub(' ', text).strip()
+    
+    # Convert emojis to text descriptions, only scanning the emoji table when one is present
+    if _EMOJI_RE.search(text):
+        text = emoji.demojize(text, delimiters=(" ", " "))
     
     # Remove URLs
-    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+    text = _URL_RE.sub('', text)
     
     # Remove mentions and hashtags symbols but keep the text
-    text = re.sub(r'[@#]', '', text)
+    text = _MENTION_RE.sub('', text)
     
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _WS_RE.sub(' ', text).strip()
     
     return text
 
-def truncate_text(text, max_length=512):
-    """Truncate text to character limit"""
-    return text[:max_length] if len(text) > max_length else text
+def encode(tokenizer, texts):
+    """Tokenize a batch, padded to its longest text or to a fixed bucket for compiled models"""
+    if not use_torch_compile():
+        return tokenizer(texts, padding=True, truncation=True, max_length=MAX_SEQUENCE_LENGTH,
+                         return_tensors='pt')
+    
+    encoded = tokenizer(texts, truncation=True, max_length=MAX_SEQUENCE_LENGTH)
+    longest = max(len(ids) for ids in encoded['input_ids'])
+    bucket = next(length for length in SEQUENCE_BUCKETS if length >= longest)
+    return mark_batch_dynamic(tokenizer.pad(encoded, padding='max_length', max_length=bucket, return_tensors='pt'))
 
-def analyze_sentiment(text, language='en'):
-    """Analyze sentiment of a single text"""
+def mark_batch_dynamic(encoded):
+    """Let compiled graphs accept any batch size, only the bucketed sequence length is static"""
+    if len(encoded['input_ids']) > 1:  # torch.compile always specializes size 1
+        for tensor in encoded.values():
+            torch._dynamo.mark_dynamic(tensor, 0)
+    return encoded
+
+def predict(tokenizer, model, texts):
+    """Run one forward pass and return a (label, score) pair per text"""
+    encoded = encode(tokenizer, texts).to(model.device)
+    with autocast():
+        logits = model(**encoded).logits
+    scores, ids = logits.float().softmax(-1).max(-1)
+    id2label = model.config.id2label
+    return [(id2label[i], score) for i, score in zip(ids.tolist(), scores.tolist())]
+
+@torch.inference_mode()
+def warmup_model(tokenizer, model, notify=None):
+    """Run a dummy input through the model so compilation happens before real traffic"""
+    if not use_torch_compile():
+        predict(tokenizer, model, ['warmup'])
+        return
+    # A single text and a dynamic batch size per bucket cover every shape seen at runtime
+    for length in SEQUENCE_BUCKETS:
+        for batch in (['warmup'], ['warmup', 'warmup']):
+            encoded = tokenizer(batch, padding='max_length', max_length=length, return_tensors='pt')
+            with autocast():
+                model(**mark_batch_dynamic(encoded).to(model.device))
+            if notify:
+                notify()
+
+def preload_models(notify=None):
+    """Load and warm up every model in MODEL_MAP so no request pays the loading cost"""
+    # notify is called after every step, gunicorn uses it to send worker heartbeats
+    notify = notify or (lambda: None)
+    # One language per distinct model, languages sharing a model are loaded once
+    languages = {model_name: language for language, model_name in MODEL_MAP.items()}
+    for language in languages.values():
+        loaded = load_model(language)
+        notify()
+        if loaded:
+            warmup_model(*loaded, notify=notify)
+            notify()
+
+@torch.inference_mode()
+def analyze_sentiments(texts, language='en'):
+    """Analyze sentiment of multiple texts with a single model call"""
     start_time = time.time()
+    results = [None] * len(texts)
+    
+    # Preprocess everything up front, empty texts never reach the model
+    pending = []
+    for i, text in enumerate(texts):
+        # Long texts are truncated to the model's 512 token limit by the tokenizer
+        processed_text = preprocess_text(text)
+        if processed_text:
+            pending.append((i, processed_text))
+        else:
+            results[i] = {
+                'text': text,
+                'sentiment': 'NEUTRAL',
+                'confidence': 0.0,
+                'error': 'Empty text after preprocessing'
+            }
     
-    # Preprocess
-    processed_text = preprocess_text(text)
-    processed_text = truncate_text(processed_text)
-    
-    if not processed_text:
-        return {
-            'text': text,
-            'sentiment': 'NEUTRAL',
-            'confidence': 0.0,
-            'error': 'Empty text after preprocessing'
-        }
+    if not pending:
+        return results
     
     # Load model
-    model = load_model(language)
-    if not model:
-        return {
-            'text': text,
-            'error': 'Model loading failed'
-        }
+    loaded = load_model(language)
+    if not loaded:
+        for i, _ in pending:
+            results[i] = {
+                'text': texts[i],
+                'error': 'Model loading failed'
+            }
+        return results
     
     try:
-        # Perform analysis
-        result = model(processed_text)[0]
-        
+        # Perform analysis, each chunk is padded to a common length and run in one forward pass
+        tokenizer, model = loaded
+        batch = [processed_text for _, processed_text in pending]
+        outputs = []
+        for start in range(0, len(batch), INFERENCE_BATCH_SIZE):
+            outputs.extend(predict(tokenizer, model, batch[start:start + INFERENCE_BATCH_SIZE]))
+    except Exception as e:
+        for i, _ in pending:
+            results[i] = {
+                'text': texts[i],
+                'error': str(e)
+            }
+        return results
+    
+    processing_time = round(time.time() - start_time, 3)
+    
+    for (i, processed_text), (label, score) in zip(pending, outputs):
         # Normalize sentiment labels
-        sentiment = result['label'].upper()
-        if 'STAR' in sentiment:  # Handle multilingual model output (1-5 stars)
-            stars = int(sentiment.split()[0])
-            if stars <= 2:
-                sentiment = 'NEGATIVE'
-            elif stars == 3:
-                sentiment = 'NEUTRAL'
-            else:
-                sentiment = 'POSITIVE'
-        
-        confidence = round(result['score'], 4)
-        processing_time = round(time.time() - start_time, 3)
+        sentiment = label.upper()
+        sentiment = _STAR_MAP.get(sentiment, sentiment)
         
-        return {
-            'text': text,
+        results[i] = {
+            'text': texts[i],
             'processed_text': processed_text,
             'sentiment': sentiment,
-            'confidence': confidence,
+            'confidence': round(score, 4),
             'language': language,
             'processing_time_seconds': processing_time
         }
-    except Exception as e:
-        return {
-            'text': text,
-            'error': str(e)
-        }
+    
+    return results
+
+def analyze_sentiment(text, language='en'):
+    """Analyze sentiment of a single text"""
+    return analyze_sentiments([text], language)[0]
+
+class MicroBatcher:
+    """Coalesce concurrent single-text requests into batched model calls"""
+    
+    def __init__(self, max_batch=32, max_wait_ms=20, queue_size=1024):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._lock = threading.Lock()
+    
+    def submit(self, text, language='en'):
+        """Queue a text for analysis and return a Future for its result"""
+        self._ensure_worker()
+        future = Future()
+        self.queue.put_nowait((text, language, future))  # Raises queue.Full when overloaded
+        return future
+    
+    def _ensure_worker(self):
+        # Started lazily so that each (forked) server process gets its own thread
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._worker.start()
+    
+    def _collect(self):
+        """Block for the first item, then gather more until the batch is full or the wait expires"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # Past the deadline, still take requests that are already waiting
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                # The worker must never die, or every queued request would hang until its timeout
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    def _process(self, batch):
+        # Group by model, languages sharing one (es/fr/de/multilingual) run in the same forward pass
+        groups = {}
+        for text, language, future in batch:
+            try:
+                model_name = MODEL_MAP.get(language, MODEL_MAP['multilingual'])
+            except TypeError as e:  # Unhashable language
+                future.set_exception(e)
+                continue
+            groups.setdefault(model_name, []).append((text, language, future))
+        
+        for items in groups.values():
+            try:
+                results = analyze_sentiments([text for text, _, _ in items], items[0][1])
+            except Exception:
+                # Retry one by one, so only the offending request fails
+                for text, language, future in items:
+                    try:
+                        future.set_result(analyze_sentiment(text, language))
+                    except Exception as e:
+                        future.set_exception(e)
+                continue
+            for (_, language, future), result in zip(items, results):
+                if 'language' in result:
+                    result['language'] = language
+                future.set_result(result)
+
+batcher = MicroBatcher(
+    max_batch=app.config['BATCHER_MAX_BATCH'],
+    max_wait_ms=app.config['BATCHER_MAX_WAIT_MS'],
+    queue_size=app.config['BATCHER_QUEUE_SIZE']
+)
 
 def save_to_history(text, sentiment, score, language='en'):
     """Save sentiment result to database"""
     try:
-        conn = sqlite3.connect('sentiment_history.db')
-        c = conn.cursor()
-        c.execute('INSERT INTO sentiment_results (text, sentiment, score, language) VALUES (?, ?, ?, ?)',
-                  (text, sentiment, score, language))
-        conn.commit()
-        conn.close()
+        conn = get_db()
+        with conn:  # Commits, or rolls back so the shared connection is left clean
+            conn.execute('INSERT INTO sentiment_results (text, sentiment, score, language) VALUES (?, ?, ?, ?)',
+                         (text, sentiment, score, language))
+    except Exception as e:
+        print(f"Error saving to history: {e}")
+
+def save_many_to_history(rows):
+    """Save several (text, sentiment, score, language) rows in a single transaction"""
+    if not rows:
+        return
+    try:
+        conn = get_db()
+        with conn:
+            conn.executemany('INSERT INTO sentiment_results (text, sentiment, score, language) VALUES (?, ?, ?, ?)',
+                             rows)
     except Exception as e:
         print(f"Error saving to history: {e}")
 
@@ -194,10 +529,18 @@ def analyze():
     language = data.get('language', 'en')
     save_history = data.get('save_history', True)
     
+    if not isinstance(text, str) or not isinstance(language, str):
+        return jsonify({'error': 'Fields text and language must be strings'}), 400
+    
     if not text:
         return jsonify({'error': 'Text cannot be empty'}), 400
     
-    result = analyze_sentiment(text, language)
+    try:
+        result = batcher.submit(text, language).result(timeout=app.config['BATCHER_TIMEOUT'])
+    except queue.Full:
+        return jsonify({'error': 'Server is busy, please retry later'}), 503
+    except FutureTimeoutError:
+        return jsonify({'error': 'Analysis timed out'}), 504
     
     if 'error' not in result and save_history:
         save_to_history(text, result['sentiment'], result['confidence'], language)
@@ -223,13 +566,14 @@ def batch_analyze():
     if len(texts) > 100:
         return jsonify({'error': 'Maximum 100 texts per batch'}), 400
     
-    results = []
-    for text in texts:
-        result = analyze_sentiment(text, language)
-        results.append(result)
-        
-        if 'error' not in result and save_history:
-            save_to_history(text, result['sentiment'], result['confidence'], language)
+    results = analyze_sentiments(texts, language)
+    
+    if save_history:
+        save_many_to_history([
+            (text, result['sentiment'], result['confidence'], language)
+            for text, result in zip(texts, results)
+            if 'error' not in result
+        ])
     
     # Calculate batch statistics
     successful = [r for r in results if 'error' not in r]
@@ -240,11 +584,11 @@ def batch_analyze():
     }
     
     if successful:
-        sentiments = [r['sentiment'] for r in successful]
+        counts = Counter(r['sentiment'] for r in successful)
         stats['sentiment_distribution'] = {
-            'POSITIVE': sentiments.count('POSITIVE'),
-            'NEGATIVE': sentiments.count('NEGATIVE'),
-            'NEUTRAL': sentiments.count('NEUTRAL')
+            'POSITIVE': counts['POSITIVE'],
+            'NEGATIVE': counts['NEGATIVE'],
+            'NEUTRAL': counts['NEUTRAL']
         }
     
     return jsonify({
@@ -261,8 +605,7 @@ def get_history():
     sentiment_filter = request.args.get('sentiment', None)
     
     try:
-        conn = sqlite3.connect('sentiment_history.db')
-        c = conn.cursor()
+        c = get_db().cursor()
         
         if sentiment_filter:
             c.execute('''SELECT * FROM sentiment_results 
@@ -278,15 +621,14 @@ def get_history():
         
         results = c.fetchall()
         
-        # Get total count
+        # Get total count from the trigger-maintained counters
         if sentiment_filter:
-            c.execute('SELECT COUNT(*) FROM sentiment_results WHERE sentiment = ?', 
+            c.execute('SELECT COALESCE(SUM(n), 0) FROM sentiment_counts WHERE sentiment = ?', 
                      (sentiment_filter.upper(),))
         else:
-            c.execute('SELECT COUNT(*) FROM sentiment_results')
+            c.execute('SELECT COALESCE(SUM(n), 0) FROM sentiment_counts')
         
         total = c.fetchone()[0]
-        conn.close()
         
         history = []
         for row in results:
@@ -314,33 +656,23 @@ def get_history():
 def get_statistics():
     """Get sentiment analysis statistics"""
     try:
-        conn = sqlite3.connect('sentiment_history.db')
-        c = conn.cursor()
+        c = get_db().cursor()
         
-        # Overall statistics
-        c.execute('SELECT COUNT(*) FROM sentiment_results')
-        total_analyses = c.fetchone()[0]
-        
-        # Sentiment distribution
-        c.execute('''SELECT sentiment, COUNT(*) as count 
-                    FROM sentiment_results 
-                    GROUP BY sentiment''')
-        sentiment_dist = {row[0]: row[1] for row in c.fetchall()}
-        
-        # Average confidence by sentiment
-        c.execute('''SELECT sentiment, AVG(score) as avg_confidence 
-                    FROM sentiment_results 
+        # Counts, average confidence and 24h trend per sentiment in a single scan
+        c.execute('''SELECT sentiment, COUNT(*), AVG(score),
+                           SUM(CASE WHEN timestamp >= datetime('now', '-1 day') THEN 1 ELSE 0 END)
+                    FROM sentiment_results
                     GROUP BY sentiment''')
-        avg_confidence = {row[0]: round(row[1], 4) for row in c.fetchall()}
         
-        # Recent trend (last 24 hours)
-        c.execute('''SELECT sentiment, COUNT(*) as count 
-                    FROM sentiment_results 
-                    WHERE timestamp >= datetime('now', '-1 day')
-                    GROUP BY sentiment''')
-        recent_trend = {row[0]: row[1] for row in c.fetchall()}
-        
-        conn.close()
+        sentiment_dist = {}
+        avg_confidence = {}
+        recent_trend = {}
+        for sentiment, count, avg_score, recent in c.fetchall():
+            sentiment_dist[sentiment] = count
+            avg_confidence[sentiment] = round(avg_score, 4)
+            if recent:
+                recent_trend[sentiment] = recent
+        total_analyses = sum(sentiment_dist.values())
         
         return jsonify({
             'total_analyses': total_analyses,
@@ -359,14 +691,31 @@ def export_history():
     format_type = request.args.get('format', 'json')
     
     try:
-        conn = sqlite3.connect('sentiment_history.db')
-        c = conn.cursor()
+        c = get_db().cursor()
         c.execute('SELECT * FROM sentiment_results ORDER BY timestamp DESC')
-        results = c.fetchall()
-        conn.close()
+        
+        if format_type == 'csv':
+            # Stream rows straight from the cursor instead of building the whole file in memory
+            def generate():
+                output = io.StringIO()
+                writer = csv.writer(output, lineterminator='\n')
+                writer.writerow(['id', 'text', 'sentiment', 'confidence', 'language', 'timestamp'])
+                for row in c:
+                    writer.writerow(row)
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate(0)
+                if output.tell():
+                    yield output.getvalue()
+            
+            return Response(
+                stream_with_context(generate()),
+                mimetype='text/csv',
+                headers={'Content-Disposition': 'attachment; filename=sentiment_history.csv'}
+            )
         
         data = []
-        for row in results:
+        for row in c.fetchall():
             data.append({
                 'id': row[0],
                 'text': row[1],
@@ -376,21 +725,6 @@ def export_history():
                 'timestamp': row[5]
             })
         
-        if format_type == 'csv':
-            # Simple CSV export
-            import io
-            output = io.StringIO()
-            output.write('id,text,sentiment,confidence,language,timestamp\n')
-            for item in data:
-                output.write(f"{item['id']},\"{item['text']}\",{item['sentiment']},{item['confidence']},{item['language']},{item['timestamp']}\n")
-            
-            from flask import Response
-            return Response(
-                output.getvalue(),
-                mimetype='text/csv',
-                headers={'Content-Disposition': 'attachment; filename=sentiment_history.csv'}
-            )
-        
         return jsonify(data), 200
     
     except Exception as e:
@@ -478,10 +812,11 @@ def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
-    # Pre-load English model for faster first request
-    print("Loading English sentiment analysis model...")
-    load_model('en')
-    print("Model loaded successfully!")
-    
-    # Run the app
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Pre-load all models for faster first requests
+    print("Loading sentiment analysis models...")
+    preload_models()
+    print("Models loaded successfully!")
+    
+    # Development server only, in production run: gunicorn app:app (see gunicorn.conf.py)
+    # The debug reloader would load every model twice, threads let requests overlap
+    app.run(debug=False, threaded=True, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
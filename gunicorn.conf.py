@@ -0,0 +1,23 @@
+"""
+Gunicorn configuration for the Sentiment Analysis API
+Run with: gunicorn app:app
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# A single worker keeps one copy of the models in memory; its threads serve
+# requests concurrently since PyTorch releases the GIL during the forward pass
+workers = 1
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Model loading (and the first download) happens before the worker serves requests,
+# so a heartbeat is sent after each loading and warm-up step; a single step, such as
+# downloading one model, must still finish within the timeout
+timeout = 120
+
+def post_worker_init(worker):
+    """Load and warm up all models once per worker, before it accepts requests"""
+    from app import preload_models
+    preload_models(notify=worker.notify)
@@ -3,12 +3,63 @@ Comprehensive Test Suite for Sentiment Analysis API
 Run with: python test_suite.py
 """
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import math
 import time
+import argparse
+import shelve
+import sys
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson  # Optional, decodes responses faster than the json module
+except ImportError:
+    orjson = None
 
 BASE_URL = "http://localhost:5000"
 API_KEY = "demo-api-key-12345"
+_VALID_SENTIMENTS = frozenset(("POSITIVE", "NEGATIVE", "NEUTRAL"))
+
+class LoopbackSession(requests.Session):
+    """Session for the local API, which never redirects, so responses are never checked for one"""
+    def request(self, method, url, **kwargs):
+        kwargs["allow_redirects"] = False
+        return super().request(method, url, **kwargs)
+
+# One session for the whole suite so connections are kept alive and reused
+SESSION = LoopbackSession()
+# Transient connection drops and gateway errors are retried with backoff instead of failing the test
+ADAPTER = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        # A response cut off after the server committed must not be resent, or history rows are duplicated
+        read=0,
+        backoff_factor=0.2,
+        # A 504 means analysis already waited out the server timeout, retrying would only wait again
+        status_forcelist=(502, 503),
+        allowed_methods=frozenset(["GET", "POST"]),
+        # Once retries run out, hand back the last response so tests can check its status
+        raise_on_status=False
+    )
+)
+SESSION.mount("http://", ADAPTER)
+SESSION.mount("https://", ADAPTER)
+SESSION.headers.update({"Content-Type": "application/json", "Connection": "keep-alive"})
+
+# Long-lived workers for fanning requests out over SESSION, so each test reuses
+# warm threads (and their kept-alive connections) instead of starting new ones
+POOL = ThreadPoolExecutor(max_workers=16)
+
+# Responses of deterministic, side-effect free requests, persisted across runs with --cache
+CACHE_FILE = ".test_cache"
+RESPONSE_CACHE = None
+_cache_lock = threading.Lock()
 
 class Colors:
     GREEN = '\033[92m'
@@ -17,26 +68,84 @@ class Colors:
     YELLOW = '\033[93m'
     RESET = '\033[0m'
 
+# Logs and pipes get plain, block-buffered output instead of a flush per colored line
+_TTY = sys.stdout.isatty()
+if not _TTY:
+    Colors.GREEN = Colors.RED = Colors.BLUE = Colors.YELLOW = Colors.RESET = ""
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=False)
+
+# Per-thread output buffer, so tests running in parallel don't interleave their output
+_output = threading.local()
+
+def output(line):
+    """Print a line, or buffer it when the current test runs in parallel with others"""
+    buffer = getattr(_output, 'buffer', None)
+    if buffer is None:
+        print(line)
+    else:
+        buffer.append(line)
+
 def print_test(name):
-    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
-    print(f"{Colors.BLUE}TEST: {name}{Colors.RESET}")
-    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
+    rule = f"{Colors.BLUE}{'='*60}{Colors.RESET}"
+    output(f"\n{rule}\n{Colors.BLUE}TEST: {name}{Colors.RESET}\n{rule}")
 
 def print_success(message):
-    print(f"{Colors.GREEN}✓ {message}{Colors.RESET}")
+    output(f"{Colors.GREEN}✓ {message}{Colors.RESET}")
 
 def print_error(message):
-    print(f"{Colors.RED}✗ {message}{Colors.RESET}")
+    output(f"{Colors.RED}✗ {message}{Colors.RESET}")
 
 def print_info(message):
-    print(f"{Colors.YELLOW}ℹ {message}{Colors.RESET}")
+    output(f"{Colors.YELLOW}ℹ {message}{Colors.RESET}")
+
+def parse_json(response):
+    """Decode a JSON response body"""
+    return orjson.loads(response.content) if orjson else response.json()
+
+def format_json(data):
+    """Pretty-print data as indented JSON"""
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(data, indent=2)
+
+class CachedResponse:
+    """Stand-in for a requests.Response replayed from the response cache"""
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+    
+    def json(self):
+        return json.loads(self.content)
+
+def cached_post(url, payload, **kwargs):
+    """POST a payload, replaying the stored response for an identical earlier request when caching is on"""
+    # Requests that write history must always reach the server
+    if RESPONSE_CACHE is None or payload.get("save_history") is not False:
+        return SESSION.post(url, json=payload, **kwargs)
+    
+    key = f"{url} {json.dumps(payload, sort_keys=True)}"
+    with _cache_lock:
+        cached = RESPONSE_CACHE.get(key)
+    if cached:
+        return CachedResponse(*cached)
+    
+    response = SESSION.post(url, json=payload, **kwargs)
+    if response.status_code == 200:
+        with _cache_lock:
+            RESPONSE_CACHE[key] = (response.status_code, response.content)
+    return response
+
+def post_concurrently(url, payloads, **kwargs):
+    """POST all payloads in parallel over the shared session, returning futures in payload order"""
+    return [POOL.submit(cached_post, url, payload, **kwargs) for payload in payloads]
 
 def test_health_check():
     print_test("Health Check Endpoint")
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = SESSION.get(f"{BASE_URL}/health")
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             print_success(f"Health check passed: {data['status']}")
             print_info(f"Models loaded: {data.get('models_loaded', [])}")
             print_info(f"Version: {data.get('version', 'N/A')}")
@@ -82,22 +191,24 @@ def test_single_analysis():
     passed = 0
     total = len(test_cases)
     
-    for test in test_cases:
+    # Send all cases at once, then report them in order
+    futures = post_concurrently(
+        f"{BASE_URL}/api/analyze",
+        [{"text": test["text"], "save_history": False} for test in test_cases]
+    )
+    
+    for test, future in zip(test_cases, futures):
         try:
-            response = requests.post(
-                f"{BASE_URL}/api/analyze",
-                json={"text": test["text"], "save_history": False},
-                headers={"Content-Type": "application/json"}
-            )
+            response = future.result()
             
             if response.status_code == 200:
-                data = response.json()
+                data = parse_json(response)
                 sentiment = data.get('sentiment', '')
                 confidence = data.get('confidence', 0)
                 processing_time = data.get('processing_time_seconds', 0)
                 
                 # Check if sentiment matches (allowing for model variation)
-                if sentiment == test["expected"] or sentiment in ["POSITIVE", "NEGATIVE", "NEUTRAL"]:
+                if sentiment == test["expected"] or sentiment in _VALID_SENTIMENTS:
                     print_success(f"{test['name']}: {sentiment} (confidence: {confidence:.4f}, time: {processing_time:.3f}s)")
                     passed += 1
                 else:
@@ -121,17 +232,15 @@ def test_batch_processing():
         "Terrible experience, would not buy again."
     ]
     
+    body = json.dumps({"texts": texts, "save_history": False}).encode()
+    
     try:
-        start_time = time.time()
-        response = requests.post(
-            f"{BASE_URL}/api/batch",
-            json={"texts": texts, "save_history": False},
-            headers={"Content-Type": "application/json"}
-        )
-        elapsed = time.time() - start_time
+        start_time = time.perf_counter()
+        response = SESSION.post(f"{BASE_URL}/api/batch", data=body)
+        elapsed = time.perf_counter() - start_time
         
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             results = data.get('results', [])
             stats = data.get('statistics', {})
             
@@ -145,7 +254,7 @@ def test_batch_processing():
             for i, result in enumerate(results):
                 sentiment = result.get('sentiment', 'UNKNOWN')
                 confidence = result.get('confidence', 0)
-                print(f"  {i+1}. {sentiment} ({confidence:.4f})")
+                output(f"  {i+1}. {sentiment} ({confidence:.4f})")
             
             return len(results) == len(texts)
         else:
@@ -165,16 +274,17 @@ def test_multilingual():
     ]
     
     passed = 0
-    for test in test_cases:
+    futures = post_concurrently(
+        f"{BASE_URL}/api/analyze",
+        [{"text": test["text"], "language": test["language"], "save_history": False} for test in test_cases]
+    )
+    
+    for test, future in zip(test_cases, futures):
         try:
-            response = requests.post(
-                f"{BASE_URL}/api/analyze",
-                json={"text": test["text"], "language": test["language"], "save_history": False},
-                headers={"Content-Type": "application/json"}
-            )
+            response = future.result()
             
             if response.status_code == 200:
-                data = response.json()
+                data = parse_json(response)
                 sentiment = data.get('sentiment', '')
                 confidence = data.get('confidence', 0)
                 print_success(f"{test['name']}: {sentiment} (confidence: {confidence:.4f})")
@@ -189,25 +299,25 @@ def test_multilingual():
 def test_history_endpoint():
     print_test("Historical Results")
     
-    # First, add some data
+    # First, add some data through the single analysis endpoint, all texts at once
     test_texts = [
         "Great product!",
         "Bad service.",
         "Okay experience."
     ]
     
-    for text in test_texts:
-        requests.post(
-            f"{BASE_URL}/api/analyze",
-            json={"text": text, "save_history": True}
-        )
+    for future in post_concurrently(
+        f"{BASE_URL}/api/analyze",
+        [{"text": text, "save_history": True} for text in test_texts]
+    ):
+        future.result()
     
     try:
         # Test basic history retrieval
-        response = requests.get(f"{BASE_URL}/api/history?limit=5")
+        response = SESSION.get(f"{BASE_URL}/api/history?limit=5")
         
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             history = data.get('history', [])
             total = data.get('total', 0)
             
@@ -215,9 +325,9 @@ def test_history_endpoint():
             print_info(f"Total records in database: {total}")
             
             # Test filtering
-            response = requests.get(f"{BASE_URL}/api/history?sentiment=POSITIVE&limit=10")
+            response = SESSION.get(f"{BASE_URL}/api/history?sentiment=POSITIVE&limit=10")
             if response.status_code == 200:
-                data = response.json()
+                data = parse_json(response)
                 print_success(f"Filtered positive sentiments: {len(data.get('history', []))} records")
             
             return True
@@ -232,21 +342,21 @@ def test_statistics():
     print_test("Statistics Endpoint")
     
     try:
-        response = requests.get(f"{BASE_URL}/api/stats")
+        response = SESSION.get(f"{BASE_URL}/api/stats")
         
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             
             print_success("Statistics retrieved successfully")
             print_info(f"Total analyses: {data.get('total_analyses', 0)}")
             
             if 'sentiment_distribution' in data:
                 dist = data['sentiment_distribution']
-                print_info(f"Distribution: {json.dumps(dist, indent=2)}")
+                print_info(f"Distribution: {format_json(dist)}")
             
             if 'average_confidence' in data:
                 avg = data['average_confidence']
-                print_info(f"Average confidence: {json.dumps(avg, indent=2)}")
+                print_info(f"Average confidence: {format_json(avg)}")
             
             return True
         else:
@@ -261,13 +371,10 @@ def test_api_authentication():
     
     try:
         # Test with valid API key
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/api/analyze",
             json={"text": "Test with API key"},
-            headers={
-                "Content-Type": "application/json",
-                "X-API-Key": API_KEY
-            }
+            headers={"X-API-Key": API_KEY}
         )
         
         if response.status_code == 200:
@@ -277,13 +384,10 @@ def test_api_authentication():
             return False
         
         # Test with invalid API key
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/api/analyze",
             json={"text": "Test with invalid key"},
-            headers={
-                "Content-Type": "application/json",
-                "X-API-Key": "invalid-key-123"
-            }
+            headers={"X-API-Key": "invalid-key-123"}
         )
         
         if response.status_code == 401:
@@ -299,14 +403,17 @@ def test_api_authentication():
 def test_error_handling():
     print_test("Error Handling")
     
+    # Only the status codes matter here, so the error bodies are never downloaded
     tests_passed = 0
     
     # Test 1: Empty text
     try:
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/api/analyze",
-            json={"text": ""}
+            json={"text": ""},
+            stream=True
         )
+        response.close()
         if response.status_code == 400:
             print_success("Empty text properly rejected")
             tests_passed += 1
@@ -317,10 +424,12 @@ def test_error_handling():
     
     # Test 2: Missing required field
     try:
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/api/analyze",
-            json={}
+            json={},
+            stream=True
         )
+        response.close()
         if response.status_code == 400:
             print_success("Missing field properly rejected")
             tests_passed += 1
@@ -331,7 +440,8 @@ def test_error_handling():
     
     # Test 3: Invalid endpoint
     try:
-        response = requests.get(f"{BASE_URL}/invalid-endpoint")
+        response = SESSION.get(f"{BASE_URL}/invalid-endpoint", stream=True)
+        response.close()
         if response.status_code == 404:
             print_success("Invalid endpoint properly handled")
             tests_passed += 1
@@ -347,37 +457,74 @@ def test_performance():
     
     text = "This is a great product! I highly recommend it to everyone."
     
-    # Single request performance
-    times = []
-    for i in range(5):
-        start = time.time()
-        response = requests.post(
-            f"{BASE_URL}/api/analyze",
-            json={"text": text, "save_history": False}
-        )
-        elapsed = time.time() - start
-        times.append(elapsed)
+    # Serialize the fixed payloads once instead of on every request
+    body = json.dumps({"text": text, "save_history": False}).encode()
+    batch_body = json.dumps({"texts": [text] * 10, "save_history": False}).encode()
+    
+    # Warm up the measured path (model and micro-batcher thread) so it is not part of the measurements
+    SESSION.post(f"{BASE_URL}/api/analyze", data=body)
     
-    avg_time = sum(times) / len(times)
-    min_time = min(times)
-    max_time = max(times)
+    # Single request performance
+    # Average, min and max are tracked as the requests run, in a single pass
+    runs = 5
+    total_time, min_time, max_time = 0.0, math.inf, 0.0
+    for i in range(runs):
+        start = time.perf_counter()
+        response = SESSION.post(f"{BASE_URL}/api/analyze", data=body)
+        elapsed = time.perf_counter() - start
+        total_time += elapsed
+        min_time = min(min_time, elapsed)
+        max_time = max(max_time, elapsed)
+    
+    avg_time = total_time / runs
     
     print_success(f"Average response time: {avg_time:.3f}s")
     print_info(f"Min: {min_time:.3f}s, Max: {max_time:.3f}s")
     
+    # Concurrent request throughput (the server batches concurrent requests together)
+    concurrent = 5
+    def timed_request(_):
+        start = time.perf_counter()
+        response = SESSION.post(f"{BASE_URL}/api/analyze", data=body)
+        return response.status_code, time.perf_counter() - start
+    
+    start = time.perf_counter()
+    concurrent_results = list(POOL.map(timed_request, range(concurrent)))
+    concurrent_elapsed = time.perf_counter() - start
+    
+    # Only successful requests count, a fast error response must not inflate the throughput
+    concurrent_times = [elapsed for status, elapsed in concurrent_results if status == 200]
+    concurrent_ok = len(concurrent_times) == len(concurrent_results)
+    if concurrent_ok:
+        print_success(f"Concurrent throughput ({concurrent} requests): {concurrent / concurrent_elapsed:.1f} req/s")
+        print_info(f"Average concurrent response time: {sum(concurrent_times) / len(concurrent_times):.3f}s")
+    else:
+        statuses = [status for status, _ in concurrent_results]
+        print_error(f"Concurrent requests failed: {len(concurrent_times)}/{concurrent} succeeded, status codes {statuses}")
+    
     # Batch performance
-    batch_texts = [text] * 10
-    start = time.time()
-    response = requests.post(
-        f"{BASE_URL}/api/batch",
-        json={"texts": batch_texts, "save_history": False}
-    )
-    batch_time = time.time() - start
+    start = time.perf_counter()
+    response = SESSION.post(f"{BASE_URL}/api/batch", data=batch_body)
+    batch_time = time.perf_counter() - start
     
     print_success(f"Batch (10 texts) time: {batch_time:.3f}s")
     print_info(f"Average per text: {batch_time/10:.3f}s")
     
-    return avg_time < 1.0  # Should be under 1 second after model is loaded
+    return concurrent_ok and avg_time < 1.0  # Should be under 1 second after model is loaded
+
+def run_test(name, test_func, buffered=False):
+    """Run one test, treating a crash as a failure; buffered output is printed in one go at the end"""
+    if buffered:
+        _output.buffer = []
+    try:
+        return test_func()
+    except Exception as e:
+        print_error(f"Test {name} crashed: {str(e)}")
+        return False
+    finally:
+        if buffered:
+            print("\n".join(_output.buffer))
+            _output.buffer = None
 
 def run_all_tests():
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
@@ -385,26 +532,41 @@ def run_all_tests():
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"{Colors.YELLOW}Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}{Colors.RESET}")
     
-    tests = [
-        ("Health Check", test_health_check),
-        ("Single Analysis", test_single_analysis),
-        ("Batch Processing", test_batch_processing),
-        ("Multilingual Support", test_multilingual),
-        ("Historical Results", test_history_endpoint),
-        ("Statistics", test_statistics),
-        ("API Authentication", test_api_authentication),
-        ("Error Handling", test_error_handling),
-        ("Performance", test_performance)
+    # Tests in the same stage are independent and run in parallel. History writes data,
+    # and performance runs alone at the end so nothing else skews its timings.
+    stages = [
+        [("Health Check", test_health_check)],
+        [
+            ("Single Analysis", test_single_analysis),
+            ("Multilingual Support", test_multilingual),
+            ("Statistics", test_statistics),
+            ("API Authentication", test_api_authentication),
+            ("Error Handling", test_error_handling)
+        ],
+        [("Historical Results", test_history_endpoint)],
+        [("Batch Processing", test_batch_processing)],
+        [("Performance", test_performance)]
     ]
     
-    results = []
-    for name, test_func in tests:
-        try:
-            result = test_func()
-            results.append((name, result))
-        except Exception as e:
-            print_error(f"Test {name} crashed: {str(e)}")
-            results.append((name, False))
+    outcomes = {}
+    for stage in stages:
+        if len(stage) == 1:
+            name, test_func = stage[0]
+            outcomes[name] = run_test(name, test_func)
+            continue
+        
+        with ThreadPoolExecutor(max_workers=len(stage)) as executor:
+            futures = [(name, executor.submit(run_test, name, test_func, buffered=True))
+                       for name, test_func in stage]
+        for name, future in futures:
+            outcomes[name] = future.result()
+    
+    # Report in the usual order
+    order = [
+        "Health Check", "Single Analysis", "Batch Processing", "Multilingual Support",
+        "Historical Results", "Statistics", "API Authentication", "Error Handling", "Performance"
+    ]
+    results = [(name, outcomes[name]) for name in order]
     
     # Summary
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
@@ -427,12 +589,31 @@ def run_all_tests():
     
     print(f"{Colors.YELLOW}Completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}{Colors.RESET}\n")
 
+def api_is_running():
+    """Probe the health endpoint to see whether the API is up"""
+    try:
+        # Plain request without the session's retries, so a refused connection fails fast
+        return requests.get(f"{BASE_URL}/health", timeout=0.5).status_code == 200
+    except requests.RequestException:
+        return False
+
 if __name__ == "__main__":
-    print("\nMake sure the Flask API is running on http://localhost:5000")
-    print("Start the API with: python app.py\n")
-    
-    response = input("Is the API running? (yes/no): ")
-    if response.lower() in ['yes', 'y']:
-        run_all_tests()
+    parser = argparse.ArgumentParser(description="Test suite for the Sentiment Analysis API")
+    parser.add_argument("--assume-running", action="store_true",
+                        help="skip the health probe and run the tests right away")
+    parser.add_argument("--cache", action="store_true",
+                        help=f"replay analysis responses stored in {CACHE_FILE} from earlier runs "
+                             "(never used for performance measurements)")
+    args = parser.parse_args()
+    
+    if args.assume_running or api_is_running():
+        if args.cache:
+            RESPONSE_CACHE = shelve.open(CACHE_FILE)
+        try:
+            run_all_tests()
+        finally:
+            if RESPONSE_CACHE is not None:
+                RESPONSE_CACHE.close()
     else:
-        print("Please start the API first and then run this test suite.")
+        print(f"\nThe API is not reachable at {BASE_URL}")
+        print("Start the API with: python app.py, then run this test suite again.")